@@ -5,72 +5,36 @@ from __future__ import print_function
 import argparse
 import fileinput
 import json
-from json import JSONEncoder,JSONDecoder
 import os
 import re
 import shutil
 import stat
-import subprocess
 import sys
 import tarfile
 import tempfile
 
-from twobit.oebuild import BBLayerSerializer, FetcherEncoder, LayerSerializer, PathSanity, Repo, RepoEncoder, RepoFetcher
-
-def layers_from_bblayers(top_dir, bblayers_fd):
-    """ Parse the layers from the bblayers.conf file
+# ujson is a C extension that parses JSON considerably faster than the stdlib
+# json module. It's optional: fall back to json if it's missing.
+try:
+    import ujson as _json
+except ImportError:
+    _json = json
 
-    top_dir: The absolute path to replace occurrences of TOPDIR in the
-             bblayers.conf file.
-    bblayers_fd: A file object attached to the bblayers.conf file
-    """
-    front = ""
-    while True:
-        cur = bblayers_fd.read(1)
-        if not front.endswith("BBLAYERS"):
-            front += cur
-        else:
-            break
-    # Gobble till first quote
-    while True:
-        cur = bblayers_fd.read(1)
-        if cur == '\"':
-            break
-    # collect all characters till the next quote
-    layers = ""
-    while True:
-        cur = bblayers_fd.read(1)
-        if cur == '\"' and not layers.endswith('\\'):
-            break
-        else:
-            if cur == '\n':
-                layers += ' '
-            else:
-                layers += cur
-
-    # strip newlines and extra whitespace
-    tmp =  " ".join(layers.replace("${TOPDIR}", top_dir).split())
-    return tmp
+from twobit.oebuild import BBLayerSerializer, FetcherEncoder, LayerSerializer, PathSanity, Repo, RepoEncoder, RepoFetcher
 
-def repo_state(git_dir):
-    """ Collect the url, branch and revision of the parameter git repo
+def repos_from_json(json_file):
+    """ Parse a JSON file describing repos into a list of Repo objects.
 
-    git_dir: The file path to a local git clone.
-    returns a tripple (url, branch, rev)
+    json_file: Path to the JSON file, typically LAYERS.json.
+    Raises ValueError if the file isn't valid JSON.
     """
-    rev = subprocess.check_output(
-        ["git", "--git-dir", git_dir, "rev-parse", "HEAD"]
-    ).rstrip()
-    branch = subprocess.check_output(
-        ["git", "--git-dir", git_dir, "rev-parse", "--abbrev-ref", "HEAD"]
-    ).rstrip()
-    remote = subprocess.check_output(
-        ["git", "--git-dir", git_dir, "rev-parse", "--abbrev-ref", "--symbolic-full-name", "@{u}"]
-    ).split("/")[0].rstrip()
-    url = subprocess.check_output(
-        ["git", "--git-dir", git_dir, "config", "--get", "remote." + remote + ".url"]
-    ).rstrip()
-    return url, branch, rev
+    # read raw bytes: both json and ujson accept them and do the UTF-8
+    # decoding as part of the parse
+    with open(json_file, 'rb') as repos_fd:
+        data = repos_fd.read()
+    # ujson has no object_hook so decode the Repo objects in a second pass
+    # over the list
+    return [Repo.repo_decode(obj) for obj in _json.loads(data)]
 
 def json_gen(args):
     """ Parse bblayers.conf and collect data from repos in src_dir to generate
@@ -191,19 +155,20 @@ def setup(args):
         sys.exit(1)
 
     # Parse JSON file with repo data
-    with open(paths["json_src"], 'r') as repos_fd:
-        while True:
-            try:
-                repos = JSONDecoder(object_hook=Repo.repo_decode).decode(repos_fd.read())
-                fetcher = RepoFetcher(paths["src_dir"], repos=repos)
-            except ValueError:
-                break;
+    try:
+        repos = repos_from_json(paths["json_src"])
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    fetcher = RepoFetcher(paths["src_dir"], repos=repos)
     # create bblayers.conf file
     if not os.path.isdir(paths["conf_dir"]):
         os.mkdir(paths["conf_dir"])
     bblayers = BBLayerSerializer(paths.getitem_rel("src_dir"),
                                  repos=fetcher._repos)
-    with open(paths["bblayers_dst"], 'w') as test_file:
+    # a 64k buffer is large enough that bblayers.conf reaches the kernel in
+    # a single write
+    with open(paths["bblayers_dst"], 'w', buffering=65536) as test_file:
         bblayers.write(fd=test_file)
 
     # create LAYERS.json in root of build to make it obvious which layers are
@@ -241,20 +206,19 @@ def fetch_repos(args):
         sys.exit(1)
 
     # Parse JSON file with repo data
-    with open(paths["json_in"], 'r') as repos_fd:
-        while True:
-            try:
-                repos = JSONDecoder(object_hook=Repo.repo_decode).decode(repos_fd.read())
-                fetcher = RepoFetcher(paths["src_dir"], repos=repos)
-            except ValueError:
-                break;
+    try:
+        repos = repos_from_json(paths["json_in"])
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    fetcher = RepoFetcher(paths["src_dir"], repos=repos)
 
     if not os.path.exists(paths["src_dir"]):
         os.mkdir(paths["src_dir"])
 
     try:
         if not update:
-            fetcher.clone()
+            fetcher.clone(use_pygit2=args.pygit2)
         else:
             fetcher.update()
     except EnvironmentError as e:
@@ -314,11 +278,13 @@ def main():
     # file
     fetch_help = "Fetch repos and set them to the state defined in JSON file."
     fetch_update_help = "Update existing repos if necessary. Use carefully."
+    fetch_pygit2_help = "Clone repos with pygit2 instead of the git command."
     fetch_parser = actionparser.add_parser("fetch", help=fetch_help)
     fetch_parser.add_argument("-s", "--src-dir", default="sources", help=source_dir_help)
     fetch_parser.add_argument("-t", "--top-dir", default=os.getcwd(), help=top_dir_help)
     fetch_parser.add_argument("-j", "--json-in", default="LAYERS.json", help=repos_json_help)
     fetch_parser.add_argument("-u", "--update", action="store_true", default=False, help=fetch_update_help)
+    fetch_parser.add_argument("-p", "--pygit2", action="store_true", default=False, help=fetch_pygit2_help)
     fetch_parser.set_defaults(func=fetch_repos)
 
     args = parser.parse_args()
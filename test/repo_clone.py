@@ -19,12 +19,17 @@ def main():
     parser.add_argument("-r", "--revision",
                         default="head",
                         help="default revision")
+    parser.add_argument("-p", "--pygit2",
+                        action="store_true",
+                        default=False,
+                        help="clone with pygit2")
     args = parser.parse_args()
 
     repo = Repo(args.name, args.url, args.branch, args.revision, None)
     print("twobit.oebuild.Repo test Clone:\n{0}".format (repo))
     try:
-        repo.clone(args.name)
+        if repo.clone(args.name, use_pygit2=args.pygit2) != 0:
+            sys.exit(1)
     except Exception as e:
         print(e)
         sys.exit(1)
@@ -0,0 +1,46 @@
+#!/bin/sh
+
+if [ -f ./functions.sh ]; then
+    . ./functions.sh
+else
+    echo "missing function library"
+    exit 1
+fi
+
+# skip if pygit2 isn't available to the interpreter under test
+if ! python -c "import pygit2" 2> /dev/null; then
+    echo "pygit2 not installed, skipping"
+    exit 0
+fi
+
+# setup
+# create empty repo
+BASE=$(echo "$0" | sed 's&^\(.*\)\.sh&\1&')
+REPO_DIR=${BASE}.git
+REPO_TMP=${BASE}_tmp
+REPO_NAME=${BASE}_test
+
+repo_init ${REPO_DIR} ${REPO_TMP}
+# add a test file & commit
+echo "test" | { repo_commit ${REPO_TMP} test_file; }
+rm -rf ${REPO_TMP}
+
+# test
+PYTHONPATH+=../ python ./repo_clone.py --name="${REPO_NAME}" \
+    --url="${REPO_DIR}" --branch="master" --revision="head" --pygit2
+if [ $? -ne 0 ]; then
+    exit 1
+fi
+
+# test for success: the branch must be checked out and track its upstream
+# since repo_state relies on '@{u}'
+GIT_DIR=${REPO_NAME}/${REPO_NAME}/.git
+if [ "$(git --git-dir=${GIT_DIR} rev-parse --abbrev-ref HEAD)" != "master" ]; then
+    exit 2
+fi
+if [ "$(git --git-dir=${GIT_DIR} rev-parse --abbrev-ref --symbolic-full-name @{u})" != "origin/master" ]; then
+    exit 3
+fi
+
+# tear down
+rm -rf ${REPO_NAME} ${REPO_DIR}
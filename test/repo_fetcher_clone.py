@@ -0,0 +1,45 @@
+from twobit.oebuild import Repo, RepoFetcher
+from twobit.oebuild import repo_fetcher
+from argparse import ArgumentParser
+import sys
+
+def main():
+    """ Test case to exercise the clone method from the RepoFetcher object.
+
+    The repos are cloned from a single thread so the order they're started in
+    is fixed. The repo named by --exists must already be present in the
+    source directory: cloning has to stop there without starting any of the
+    repos after it and the error has to reach the caller.
+    """
+    description="Program to clone git repos using the twobit.oebuild.RepoFetcher object."
+    parser = ArgumentParser(prog=__file__, description=description)
+    parser.add_argument("-s", "--src-dir",
+                        default="sources",
+                        help="directory to clone repos into")
+    parser.add_argument("-e", "--exists",
+                        default=None,
+                        help="name of the repo whose directory already exists")
+    parser.add_argument("repos", nargs="+", metavar="NAME=URL",
+                        help="name and URL of a repo to clone")
+    args = parser.parse_args()
+
+    repos = [Repo(*repo.split("=", 1)) for repo in args.repos]
+    fetcher = RepoFetcher(args.src_dir, repos=repos)
+    repo_fetcher.MAX_CLONE_THREADS = 1
+    try:
+        ret = fetcher.clone()
+    except EnvironmentError as e:
+        if args.exists is None or args.exists not in str(e):
+            print("unexpected error: {0}".format(e))
+            sys.exit(1)
+        print("got expected error: {0}".format(e))
+        return
+    if args.exists is not None:
+        print("clone of existing repo {0} didn't fail".format(args.exists))
+        sys.exit(1)
+    if ret != [0] * len(repos):
+        print("unexpected clone status: {0}".format(ret))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
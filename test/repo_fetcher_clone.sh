@@ -0,0 +1,83 @@
+#!/bin/sh
+
+if [ -f ./functions.sh ]; then
+    . ./functions.sh
+else
+    echo "missing function library"
+    exit 1
+fi
+
+# setup
+# create three repos with a commit each
+BASE=$(echo "$0" | sed 's&^\(.*\)\.sh&\1&')
+TOP_DIR=${BASE}_top
+SRC_DIR=${TOP_DIR}/sources
+BUILD_OP=$(pwd)/../build_op.py
+for NAME in one two three; do
+    repo_init ${BASE}_${NAME}.git ${BASE}_${NAME}_tmp
+    echo "${NAME}" | { repo_commit ${BASE}_${NAME}_tmp test_file; }
+    rm -rf ${BASE}_${NAME}_tmp
+done
+URL_PREFIX=$(pwd)/${BASE}
+mkdir ${TOP_DIR}
+cat > ${TOP_DIR}/LAYERS.json << EOF_JSON
+[
+    { "name": "one", "url": "${URL_PREFIX}_one.git" },
+    { "name": "two", "url": "${URL_PREFIX}_two.git" },
+    { "name": "three", "url": "${URL_PREFIX}_three.git" }
+]
+EOF_JSON
+
+# check that a repo in the source dir is a complete clone of its origin
+repo_cloned () {
+    local NAME=$1
+    local GIT_DIR=${SRC_DIR}/${NAME}/.git
+
+    [ "$(git --git-dir=${GIT_DIR} rev-parse HEAD)" = \
+      "$(git --git-dir=${BASE}_${NAME}.git rev-parse master)" ] || return 1
+    [ "$(git --git-dir=${GIT_DIR} rev-parse --abbrev-ref HEAD)" = "master" ] || return 1
+    [ "$(cat ${SRC_DIR}/${NAME}/test_file)" = "${NAME}" ] || return 1
+}
+
+# test: fetch all repos through build_op.py
+( cd ${TOP_DIR} && PYTHONPATH+=$(pwd)/../../ python ${BUILD_OP} fetch )
+if [ $? -ne 0 ]; then
+    exit 1
+fi
+for NAME in one two three; do
+    repo_cloned ${NAME} || exit 2
+done
+
+# test: a repo directory that already exists fails the fetch and is left
+# alone, the others are either cloned completely or not touched at all
+rm -rf ${SRC_DIR}
+mkdir -p ${SRC_DIR}/two
+echo "keep" > ${SRC_DIR}/two/marker
+OUT=$( cd ${TOP_DIR} && PYTHONPATH+=$(pwd)/../../ python ${BUILD_OP} fetch 2>&1 )
+if [ $? -eq 0 ]; then
+    exit 3
+fi
+echo "${OUT}" | grep -q "Cannot clone two to .*: directory exists" || exit 4
+[ "$(cat ${SRC_DIR}/two/marker)" = "keep" ] || exit 5
+[ ! -e ${SRC_DIR}/two/.git ] || exit 6
+for NAME in one three; do
+    if [ -e ${SRC_DIR}/${NAME} ]; then
+        repo_cloned ${NAME} || exit 7
+    fi
+done
+
+# test: with a single clone thread the repos are cloned in order and none
+# are started after the one that fails
+rm -rf ${SRC_DIR}
+mkdir -p ${SRC_DIR}/two
+PYTHONPATH+=../ python ./repo_fetcher_clone.py --src-dir=${SRC_DIR} \
+    --exists=two one=${URL_PREFIX}_one.git two=${URL_PREFIX}_two.git \
+    three=${URL_PREFIX}_three.git
+if [ $? -ne 0 ]; then
+    exit 8
+fi
+repo_cloned one || exit 9
+[ ! -e ${SRC_DIR}/three ] || exit 10
+
+# tear down
+rm -rf ${TOP_DIR} ${BASE}_one.git ${BASE}_two.git ${BASE}_three.git
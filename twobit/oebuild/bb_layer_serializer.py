@@ -8,7 +8,11 @@ from repo import Repo
 class BBLayerSerializer:
     """ Class to serialize a collection of Repo objects into bblayer form.
     """
-    def __init__(self, base, repos=[]):
+    # lines preceding the list of layers, identical for every bblayers.conf
+    _HEADER = ("LCONF_VERSION ?= \"5\"\n",
+               "BBPATH ?= \"${TOPDIR}\"\n",
+               "BBLAYERS ?= \" \\\n")
+    def __init__(self, base, repos=None):
         """ Initialize class.
 
         base: Directory component relative to TOPDIR where repos live.
@@ -17,12 +21,9 @@ class BBLayerSerializer:
                interesting data that's written to the bblayers.conf file.
         """
         self._base = base
-        self._repos = []
-        for repo in repos:
-            if type(repo) is Repo:
-                self._repos.append(repo)
-            else:
-                raise TypeError
+        self._repos = list(repos) if repos is not None else []
+        if not all(isinstance(repo, Repo) for repo in self._repos):
+            raise TypeError
     def add_repo(self, repo):
         """ Add Repo object to be written to the bblayers.conf file.
 
@@ -35,12 +36,20 @@ class BBLayerSerializer:
         fd: A file object where the bblayer.conf file will be written.
             The default is sys.stdout.
         """
-        fd.write("LCONF_VERSION ?= \"5\"\n")
-        fd.write("BBPATH ?= \"${TOPDIR}\"\n")
-        fd.write("BBLAYERS ?= \" \\\n")
+        # build the whole file in memory and hand it to fd in one write
+        parts = list(self._HEADER)
+        # keep lookups out of the inner loop
+        base = self._base
+        normpath = os.path.normpath
+        append = parts.append
         for repo in self._repos:
-            if repo._layers is not None:
-                for layer in repo._layers:
-                    tmp_path = os.path.normpath("{0}/{1}/{2}".format(self._base, repo._name, layer))
-                    fd.write("    ${{TOPDIR}}/{0} \\\n".format(tmp_path))
-        fd.write("\"\n")
+            layers = repo._layers
+            if layers is None:
+                continue
+            name = repo._name
+            for layer in layers:
+                # '%' is cheaper than str.format in this inner loop
+                tmp_path = normpath("%s/%s/%s" % (base, name, layer))
+                append("    ${TOPDIR}/%s \\\n" % tmp_path)
+        append("\"\n")
+        fd.write("".join(parts))
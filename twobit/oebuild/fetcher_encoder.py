@@ -14,11 +14,49 @@ class FetcherEncoder(JSONEncoder):
 
         obj: RepoFetcher that's being encoded as JSON.
         """
-        if type(obj) is not RepoFetcher:
+        if not isinstance(obj, RepoFetcher):
             raise TypeError
         if obj._repos is None:
             raise ValueError
-        list_tmp = []
-        for repo in obj._repos:
-            list_tmp.append(RepoEncoder().default(repo))
-        return list_tmp
+        # one RepoEncoder is enough for all of the repos
+        repo_encoder = RepoEncoder()
+        return [repo_encoder.default(repo) for repo in obj._repos]
+    def iterencode(self, o, _one_shot=False):
+        """ Encode the parameter object as JSON, yielding string chunks.
+
+        RepoFetcher objects are streamed one repo at a time so 'json.dump'
+        never holds more than a single repo dictionary in memory. Anything
+        else is handed to the JSONEncoder implementation.
+        """
+        if isinstance(o, RepoFetcher):
+            return self._iterencode_fetcher(o)
+        return super(FetcherEncoder, self).iterencode(o, _one_shot)
+    def _iterencode_fetcher(self, fetcher):
+        """ Generate the JSON list for a RepoFetcher one repo at a time.
+
+        The output is identical to encoding the list returned by 'default'.
+        """
+        if fetcher._repos is None:
+            raise ValueError
+        if not fetcher._repos:
+            yield "[]"
+            return
+        if self.indent is None:
+            newline_indent = ""
+        elif isinstance(self.indent, int):
+            newline_indent = "\n" + " " * self.indent
+        else:
+            newline_indent = "\n" + self.indent
+        separator = self.item_separator + newline_indent
+        repo_encoder = RepoEncoder()
+        yield "[" + newline_indent
+        for index, repo in enumerate(fetcher._repos):
+            if index:
+                yield separator
+            # JSON strings can't hold a raw newline so this only touches the
+            # whitespace added by the encoder
+            chunk = self.encode(repo_encoder.default(repo))
+            yield chunk.replace("\n", newline_indent)
+        if self.indent is not None:
+            yield "\n"
+        yield "]"
@@ -2,16 +2,15 @@ from __future__ import print_function
 
 import sys
 
+from repo import Repo
+
 class LayerSerializer:
     """ Class to serialize a collection of Repo objects into LAYERS form.
     """
     def __init__(self, repos):
-        self._repos = []
-        for repo in repos:
-            if type(repo) is Repo:
-                self._repos.append(repo)
-            else:
-                raise TypeError
+        self._repos = list(repos)
+        if not all(isinstance(repo, Repo) for repo in self._repos):
+            raise TypeError
     def write(self, fd=sys.stdout):
         """ Write the LAYERS file to the specified file object.
         """
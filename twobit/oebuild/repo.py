@@ -1,12 +1,104 @@
 from __future__ import print_function
 
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 import os
 import subprocess
 
+# pygit2 clones in-process through libgit2 which saves starting a git process
+# for each repo. It's optional and only used when asked for, see Repo.clone.
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+# ThreadPool.map blocks KeyboardInterrupt on python 2 until every task is done.
+# Waiting on map_async with a timeout keeps the wait interruptible. The value
+# is only there to make 'get' poll: it's long enough to never expire.
+POOL_TIMEOUT = 60 * 60 * 24 * 365
+
+def pool_map(func, items, processes):
+    """ Map func over items on a pool of threads, returning the results in
+        order.
+
+    If a task raises, the queued items are dropped, the tasks already
+    running are waited for and the exception is re-raised. On
+    KeyboardInterrupt the queued items are dropped and the exception is
+    re-raised without waiting.
+    """
+    pool = ThreadPool(processes)
+    try:
+        # hand out one item at a time so a slow item never holds up others
+        result = pool.map_async(func, items, 1).get(POOL_TIMEOUT)
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise
+    except:
+        pool.terminate()
+        pool.join()
+        raise
+    pool.close()
+    pool.join()
+    return result
+
+def layers_from_bblayers(top_dir, bblayers_fd):
+    """ Parse the layers from the bblayers.conf file
+
+    top_dir: The absolute path to replace occurrences of TOPDIR in the
+             bblayers.conf file.
+    bblayers_fd: A file object attached to the bblayers.conf file
+    """
+    front = ""
+    while True:
+        cur = bblayers_fd.read(1)
+        if not front.endswith("BBLAYERS"):
+            front += cur
+        else:
+            break
+    # Gobble till first quote
+    while True:
+        cur = bblayers_fd.read(1)
+        if cur == '\"':
+            break
+    # collect all characters till the next quote
+    layers = ""
+    while True:
+        cur = bblayers_fd.read(1)
+        if cur == '\"' and not layers.endswith('\\'):
+            break
+        else:
+            if cur == '\n':
+                layers += ' '
+            else:
+                layers += cur
+
+    # strip newlines and extra whitespace
+    tmp =  " ".join(layers.replace("${TOPDIR}", top_dir).split())
+    return tmp
+
+def repo_state(git_dir):
+    """ Collect the url, branch and revision of the parameter git repo
+
+    git_dir: The file path to a local git clone.
+    returns a tripple (url, branch, rev)
+    """
+    # rev-parse emits one line per argument and '--abbrev-ref' applies to
+    # every argument after it so this gets us the revision, the branch and
+    # the upstream branch from a single git process
+    rev, branch, upstream = subprocess.check_output(
+        ["git", "--git-dir", git_dir, "rev-parse",
+         "HEAD", "--abbrev-ref", "HEAD", "@{u}"]
+    ).splitlines()
+    remote = upstream.split("/")[0]
+    url = subprocess.check_output(
+        ["git", "--git-dir", git_dir, "config", "--get", "remote." + remote + ".url"]
+    ).rstrip()
+    return url, branch, rev
+
 class Repo(object):
     """ Data required to clone a git repo in a specific state.
     """
-    def __init__(self, name, url, branch="master", revision=None, layers=["./"]):
+    def __init__(self, name, url, branch="master", revision=None, layers=("./",)):
         """ Initialize Repo object.
 
         name: Sting name of the repo.
@@ -22,7 +114,7 @@ class Repo(object):
         self._url = url
         self._branch = branch
         self._revision = revision
-        self._layers = layers
+        self._layers = list(layers) if layers is not None else None
     def set_branch(self, branch):
         """ Set branch for Repo object.
         """
@@ -38,30 +130,59 @@ class Repo(object):
     def __str__(self):
         """ Create a human readable string representation of the Repo object.
         """
-        return ("name:     {0}\n"
-                "url:      {1}\n"
-                "branch:   {2}\n"
-                "revision: {3}\n"
-                "layers:   {4}\n".format(self._name, self._url, self._branch,
-                                         self._revision,self._layers))
-    def clone(self, path):
+        return ("name:     %s\n"
+                "url:      %s\n"
+                "branch:   %s\n"
+                "revision: %s\n"
+                "layers:   %s\n" % (self._name, self._url, self._branch,
+                                     self._revision, self._layers))
+    def clone(self, path, use_pygit2=False, progress=True):
         """ Clone the Repo.
 
         path: Path where Repo will be cloned. If renative it will be relative
               to $(pwd).
+        use_pygit2: Clone in-process with pygit2 instead of running
+                    'git clone'. Raises EnvironmentError if pygit2 isn't
+                    installed. This is off by default because, without
+                    callbacks, libgit2 doesn't use git's credential helpers
+                    or ssh-agent and shows no progress, so a clone that
+                    works with the git command can fail or go quiet with
+                    pygit2.
+        progress: Show git's progress meter. Turn this off when cloning
+                  several repos at once or the meters draw over each other.
+        Returns 0 on success, non-zero otherwise.
         """
+        if use_pygit2 and pygit2 is None:
+            raise EnvironmentError("Cannot clone {0} with pygit2: pygit2 is not installed".format(self._name))
         work_dir = os.path.join(path, self._name)
         try:
             if not os.path.exists(work_dir):
                 print("cloning {0} into {1}".format (self._name, path))
+                if use_pygit2:
+                    return self._clone_pygit2(work_dir)
                 return subprocess.call(
-                    ['git', 'clone', '--progress', self._url, work_dir], shell=False
+                    ['git', 'clone', '--progress' if progress else '--quiet',
+                     self._url, work_dir], shell=False
                 )
             else:
                 raise EnvironmentError("Cannot clone {0} to {1}: directory exists".format(self._name, work_dir))
         except subprocess.CalledProcessError, e:
             print(e)
 
+    def _clone_pygit2(self, work_dir):
+        """ Clone the Repo into work_dir using pygit2.
+
+        The branch is checked out as part of the clone.
+        """
+        try:
+            pygit2.clone_repository(self._url, work_dir,
+                                    checkout_branch=self._branch)
+            return 0
+        # older pygit2 raise a bare KeyError for a branch that doesn't exist
+        except (pygit2.GitError, KeyError) as e:
+            print(e)
+            return 1
+
     def fetch(self, path):
         """ Fetch the Repo.
         """
@@ -92,7 +213,7 @@ class Repo(object):
             raise EnvironmentError("Cannot reset repo state: {0} doesn't exist".format(work_tree))
         git_dir = os.path.join(work_tree, ".git")
         try:
-            print("checking out branch: {0}".format(self._branch))
+            print("checking out branch {0} in {1}".format(self._branch, self._name))
             return subprocess.call(
                 [
                     'git',
@@ -112,14 +233,14 @@ class Repo(object):
         Use this method with care. You may lose data.
         """
         if self._revision is None:
-            print('revision is None, nothing to reset')
+            print('revision for {0} is None, nothing to reset'.format(self._name))
             return
         work_tree = os.path.join(path, self._name)
         if work_tree is None or not os.path.exists(work_tree):
             raise EnvironmentError("Cannot reset repo state: {0} doesn't exist".format(work_tree))
         git_dir = os.path.join(work_tree, ".git")
         try:
-            print("resetting repo revision {0}".format(self._revision))
+            print("resetting {0} to revision {1}".format(self._name, self._revision))
             return subprocess.call(
                 [
                     'git',
@@ -179,7 +300,7 @@ class Repo(object):
         Intended for use in JSON deserialization.
         json_obj: A dictionary object that contains a serialized Repo object.
         """
-        if type(json_obj) is not dict:
+        if not isinstance(json_obj, dict):
             raise TypeError
         return Repo(json_obj["name"],
                     json_obj["url"],
@@ -204,40 +325,56 @@ class Repo(object):
         with open(bblayers_file, 'r') as bblayers_fd:
             layers = layers_from_bblayers(top_dir, bblayers_fd)
      
-        # Create Repo objects from repos in src_dir
-        repos = []
+        # Create Repo objects from repos in src_dir. Each repo is queried
+        # with a handful of git / find processes so do them concurrently.
         subdirs = os.listdir(src_dir)
-        for item in subdirs:
-            repo_root = os.path.join(src_dir, item)
-            git_dir = os.path.join(repo_root, ".git")
-            # check that directory is a git repo
-            if os.path.isdir(git_dir):
-                # collect data from git repo
-                url, branch, rev = repo_state(git_dir)
-                # get layers in the repo we're processing
-                metas = []
-                for thing in subprocess.check_output(
-                    ["find", repo_root, "-name", "layer.conf"]
-                ).strip().split('\n'):
-                    if os.path.exists(thing):
-                        metas.append(os.path.dirname(os.path.dirname(thing)))
-
-                # find layers that are active in each repo 
-                repo_layer = []
-                for layer in metas:
-                    if layer in layers:
-                        # strip leading directory component from layer path
-                        # including directory separator character
-                        # If string is empty then meta-layer is in the root of
-                        # repo. Use explicit "./" instead of empty string.
-                        tmp = layer[len(repo_root) + 1:]
-                        if not tmp:
-                            tmp = "./"
-                        repo_layer.append(tmp)
-                # reduce empty list to None
-                if repo_layer == []:
-                    repo_layer = None
-
-                repos.append(Repo(item, url, branch=branch, revision=rev, layers=repo_layer))
-        return repos
+        if not subdirs:
+            return []
+        repos = pool_map(
+            lambda item: Repo.repo_from_state(src_dir, item, layers),
+            subdirs, min(cpu_count(), len(subdirs)))
+        return [repo for repo in repos if repo is not None]
+    @staticmethod
+    def repo_from_state(src_dir, item, layers):
+        """ Build a Repo object from the current state of a single repo.
+
+        src_dir: absolute path to the directory holding the repos
+        item: name of the repo directory in src_dir
+        layers: string of active layer paths parsed from bblayers.conf
+        Returns None if item isn't a git repo.
+        """
+        # src_dir is absolute and item is a bare directory name so plain
+        # concatenation gives the same result as os.path.join
+        repo_root = src_dir + "/" + item
+        git_dir = repo_root + "/.git"
+        # check that directory is a git repo
+        if not os.path.isdir(git_dir):
+            return None
+        # collect data from git repo
+        url, branch, rev = repo_state(git_dir)
+        # get layers in the repo we're processing
+        metas = []
+        for thing in subprocess.check_output(
+            ["find", repo_root, "-name", "layer.conf"]
+        ).strip().split('\n'):
+            if os.path.exists(thing):
+                metas.append(os.path.dirname(os.path.dirname(thing)))
+
+        # find layers that are active in each repo 
+        repo_layer = []
+        for layer in metas:
+            if layer in layers:
+                # strip leading directory component from layer path
+                # including directory separator character
+                # If string is empty then meta-layer is in the root of
+                # repo. Use explicit "./" instead of empty string.
+                tmp = layer[len(repo_root) + 1:]
+                if not tmp:
+                    tmp = "./"
+                repo_layer.append(tmp)
+        # reduce empty list to None
+        if repo_layer == []:
+            repo_layer = None
+
+        return Repo(item, url, branch=branch, revision=rev, layers=repo_layer)
 
@@ -14,13 +14,13 @@ class RepoEncoder(JSONEncoder):
 
         obj: Repo object to be encoded.
         """
-        if type(obj) is not Repo:
+        if not isinstance(obj, Repo):
             raise TypeError
-        dict_tmp = {}
-        dict_tmp["name"] = obj._name
-        dict_tmp["url"] = obj._url
-        if obj._branch != "master":
-            dict_tmp["branch"] = obj._branch
-        if obj._layers is not None:
-            dict_tmp["layers"] = obj._layers
+        dict_tmp = {"name": obj._name, "url": obj._url}
+        branch = obj._branch
+        if branch != "master":
+            dict_tmp["branch"] = branch
+        layers = obj._layers
+        if layers is not None:
+            dict_tmp["layers"] = layers
         return dict_tmp
@@ -1,23 +1,25 @@
 from __future__ import print_function
 
-from repo import Repo
+from threading import Event
+
+from repo import Repo, pool_map
+
+# upper bound on the number of repos cloned concurrently
+MAX_CLONE_THREADS = 16
 
 class RepoFetcher(object):
     """ Class to manage git repo state.
     """
-    def __init__(self, base, repos=[]):
+    def __init__(self, base, repos=None):
         """ Initialize class.
 
         base: Directory where repos will or currently do reside.
         repos: List of Repo objects for the RepoFetcher to operate on.
         """
         self._base = base
-        self._repos = []
-        for repo in repos:
-            if type(repo) is Repo:
-                self._repos.append(repo)
-            else:
-                raise TypeError
+        self._repos = list(repos) if repos is not None else []
+        if not all(isinstance(repo, Repo) for repo in self._repos):
+            raise TypeError
     def add_repo(self, repo):
         """ Add a repo to the RepoFetcher.
         """
@@ -25,17 +27,46 @@ class RepoFetcher(object):
     def __str__(self):
         """ Create a string representation of all Repos in the RepoFetcher.
         """
-        return ''.join(str(repo) for repo in self._repos)
-    def clone(self):
+        return ''.join(map(str, self._repos))
+    def _clone_repo(self, repo, use_pygit2=False):
+        """ Clone a single repo and set it to the requested state.
+
+        Returns the status returned by the Repo 'clone' method. Progress
+        meters are turned off since other repos are cloned at the same time.
+        """
+        ret = repo.clone(self._base, use_pygit2=use_pygit2, progress=False)
+        if ret != 0:
+            print("cloning {0} failed with status {1}".format(repo._name, ret))
+        repo.checkout_branch(self._base)
+        repo.reset_revision(self._base)
+        return ret
+    def clone(self, use_pygit2=False):
         """ Clone all repos in a RepoFetcher.
 
-        Does nothing more than loop over the list of Repo objects invoking the
-        'clone' method on each.
+        use_pygit2: Passed on to the 'clone' method of each Repo.
+
+        Clones are network bound so they're run concurrently from a pool of
+        threads. Returns a list with the status of each clone in the same
+        order as the Repo objects.
+
+        If cloning a repo raises an exception no further repos are started,
+        the clones already in progress are finished and the exception is
+        re-raised. Repos that weren't started are left untouched.
         """
-        for repo in self._repos:
-            repo.clone(self._base)
-            repo.checkout_branch(self._base)
-            repo.reset_revision(self._base)
+        if not self._repos:
+            return []
+        failed = Event()
+        def clone_repo(repo):
+            # don't start on another repo once one of them has failed
+            if failed.is_set():
+                return None
+            try:
+                return self._clone_repo(repo, use_pygit2)
+            except BaseException:
+                failed.set()
+                raise
+        return pool_map(clone_repo, self._repos,
+                        min(MAX_CLONE_THREADS, len(self._repos)))
     def fetch(self):
         """ Fetch all respos in the RepoFetcher.
         """